@@ -1,12 +1,24 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
 from PIL import Image, ImageDraw, ImageFont
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from io import BytesIO
 import logging
-from typing import List, Dict, Any, Optional
-from validations import validate_structured_info
+import math
+import itertools
+import hashlib
+import os
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pyarrow.parquet as pq
+from typing import List, Dict, Any, Optional, Tuple
+from validations import validate_structured_info, validate_structured_info_prenormalized, try_normalize_image_master_json
 
 # Assuming data_models.py is in the same directory or accessible via PYTHONPATH
 try:
@@ -17,118 +29,429 @@ except ImportError:
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+OVERALL_FIELDS = [
+    "text_quality_score", "courier_partner", "awb_number", "recipient_name",
+    "recipient_address", "recipient_signature", "recipient_stamp", "delivery_date",
+]
+
 # --- Helper Functions ---
 
-def draw_predictions_on_image(image: Image.Image, structured_info: Optional[StructuredImageProperty], font_size: int = 15) -> Image.Image:
-    """Draws bounding boxes and labels from StructuredImageProperty onto the image."""
-    if not structured_info:
-        return image
+PARQUET_CACHE_DIR = Path(".cache")
+BOX_COLORS = ("red", "green", "blue", "yellow", "purple", "orange", "cyan", "magenta")
+VALIDATION_COLUMNS = ["Field", "Status", "Score", "Extracted Value", "Reference Value"]
+# Images are downscaled to fit this size before drawing and display; box_2d is normalized so boxes still line up
+MAX_IMAGE_SIZE = (1600, 1600)
+
+@st.cache_data
+def load_csv(file_bytes: bytes, file_name: str, json_column: str, extra_columns: tuple = ()) -> pd.DataFrame:
+    """
+    Loads the uploaded CSV, memoized across Streamlit reruns.
+    The first load of a file persists a Parquet copy keyed by the file hash, later loads
+    read only json_column and whichever extra_columns exist from it instead of re-parsing the CSV text.
+    If json_column is missing, all columns are returned so the caller can report what is available.
+    """
+    digest = hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+    parquet_path = PARQUET_CACHE_DIR / f"{digest}.parquet"
+
+    if not parquet_path.exists():
+        df = pd.read_csv(BytesIO(file_bytes))
+        tmp_path = None
+        try:
+            PARQUET_CACHE_DIR.mkdir(exist_ok=True)
+            # Unique per writer, since sessions uploading the same file run load_csv concurrently
+            with tempfile.NamedTemporaryFile(dir=PARQUET_CACHE_DIR, suffix=".tmp", delete=False) as tmp_file:
+                tmp_path = tmp_file.name
+            df.to_parquet(tmp_path, compression="zstd")
+            os.replace(tmp_path, parquet_path)  # Atomic, so a half-written file is never read
+        except Exception as e:
+            logging.warning(f"Could not write Parquet cache for {file_name}: {e}. Using the CSV directly.")
+            if tmp_path:
+                Path(tmp_path).unlink(missing_ok=True)
+            return df
 
-    draw = ImageDraw.Draw(image)
+    try:
+        # Only read the needed columns when the JSON column exists, otherwise read everything
+        # so the caller can report which columns are available.
+        available = pq.read_schema(parquet_path).names
+        if json_column in available:
+            columns = [json_column] + [c for c in extra_columns if c in available and c != json_column]
+            return pd.read_parquet(parquet_path, columns=columns)
+        return pd.read_parquet(parquet_path)
+    except Exception as e:
+        logging.warning(f"Could not read Parquet cache for {file_name}: {e}. Discarding it and using the CSV directly.")
+        parquet_path.unlink(missing_ok=True)
+        return pd.read_csv(BytesIO(file_bytes))
+
+# Normalizing a row takes ~10-20us while spawning the worker pool takes ~0.5s,
+# so rows are only farmed out to worker processes for large files on multi-core machines
+PARALLEL_MIN_ROWS = 100_000
+
+def normalize_rows_parallel(json_strings) -> List[Tuple[Optional[Dict[str, Tuple[Optional[str], Optional[str]]]], Optional[str]]]:
+    """Normalizes rows across all CPU cores. Uses spawned workers, as forking the threaded Streamlit server is unsafe."""
+    workers = os.cpu_count() or 1
+    chunksize = max(1, len(json_strings) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(try_normalize_image_master_json, json_strings, chunksize=chunksize))
+
+def hash_series(series: pd.Series) -> str:
+    """Returns a stable content hash of a Series, used as a cache key in place of the Series itself."""
+    return hashlib.blake2b(pd.util.hash_pandas_object(series).values.tobytes(), digest_size=16).hexdigest()
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def normalize_rows(_json_series: pd.Series, json_digest: str) -> List[Dict[str, Tuple[Optional[str], Optional[str]]]]:
+    """
+    Parses every non-empty row of a column of ImageMaster JSON and pre-normalizes its values.
+    This does not depend on the threshold, so it is cached across reruns (keyed on the column digest)
+    and threshold changes only rerun the scorer. Rows that fail to parse are logged and left out,
+    as are rows with nothing to compare. The returned list is shared and must not be modified.
+    """
+    # Skip empty JSON up front and walk plain arrays rather than boxing each row into pandas objects
+    present = _json_series[_json_series.notna()]
+    json_strings = present.to_numpy()
+    if len(json_strings) >= PARALLEL_MIN_ROWS and (os.cpu_count() or 1) > 1:
+        outcomes = normalize_rows_parallel(json_strings)
+    else:
+        outcomes = map(try_normalize_image_master_json, json_strings)
+
+    normalized_rows = []
+    for index, (normalized, error) in zip(present.index.to_numpy(), outcomes):
+        if error is not None:
+            logging.error(f"Error processing row {index}: {error}")
+            continue
+        if normalized is not None:
+            normalized_rows.append(normalized)
+    return normalized_rows
+
+@st.cache_data
+def compute_overall(_json_series: pd.Series, json_digest: str, threshold: int) -> pd.DataFrame:
+    """
+    Builds the Overall statistics table for a column of ImageMaster JSON strings.
+    The Series is excluded from Streamlit's hashing (leading underscore); the cache is
+    keyed on its precomputed digest and the threshold instead.
+    """
+    # Validate every pre-normalized row once, then tally the per-field statuses.
+    status_counts = {column: {"match": 0, "hallucination": 0, "null": 0} for column in OVERALL_FIELDS}
+    for normalized in normalize_rows(_json_series, json_digest):
+        field_results = validate_structured_info_prenormalized(normalized, threshold)["field_results"]
+
+        for column in OVERALL_FIELDS:
+            status = field_results[column]["status"] if column in field_results else "null"
+            if status not in ("match", "hallucination"):
+                status = "null"
+            status_counts[column][status] += 1
+
+    overall_data = []
+    total_count = len(_json_series)
+    for column in OVERALL_FIELDS:
+        total_match = status_counts[column]["match"]
+        hallucination_count = status_counts[column]["hallucination"]
+        total_null = status_counts[column]["null"]
+
+        match_percentage = (total_match / total_count) * 100 if total_count else 0
+        null_percentage = (total_null / total_count) * 100 if total_count else 0
+        hallucination_percentage = (hallucination_count / total_count) * 100 if total_count else 0
+
+        overall_data.append({
+            "Field": column,
+            "Total Count": total_count,
+            "Total Match": total_match,
+            "Total Null": total_null,
+            "Hallucination Count": hallucination_count,
+            "Match Percentage": f"{match_percentage:.2f}%",
+            "Null Percentage": f"{null_percentage:.2f}%",
+            "Hallucination Percentage": f"{hallucination_percentage:.2f}%",
+        })
+
+    return pd.DataFrame(overall_data)
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    Returns a shared requests.Session so image downloads reuse keep-alive connections.
+    Held in st.cache_resource since module globals are re-created on every Streamlit rerun.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=Retry(total=2, backoff_factor=0.2))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+def fetch_image_bytes(url: str) -> Tuple[bytes, Optional[str]]:
+    """Downloads an image URL, memoized so reruns don't re-fetch it. Returns (content, content_type)."""
+    headers = {'User-Agent': 'Mozilla/5.0'} # Add a user-agent header
+    response = get_http_session().get(url, headers=headers, timeout=10) # Add timeout
+    response.raise_for_status() # Raise an exception for bad status codes
+    return response.content, response.headers.get('content-type')
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def decode_image(image_bytes: bytes) -> Image.Image:
+    """
+    Decodes image bytes into an RGB PIL image no larger than MAX_IMAGE_SIZE,
+    shared across reruns without copying. The returned image must not be modified in place.
+    """
+    image = Image.open(BytesIO(image_bytes))
+    image.thumbnail(MAX_IMAGE_SIZE, Image.Resampling.LANCZOS)
+    return image.convert("RGB")
+
+@st.cache_resource(show_spinner=False)
+def get_font(font_size: int) -> ImageFont.ImageFont:
+    """
+    Resolves the label font once per size instead of probing the filesystem on every draw.
+    Held in st.cache_resource since module globals are re-created on every Streamlit rerun.
+    """
     try:
         # Load a default font or specify a path
         # Use a common font likely available on macOS/Linux/Windows
-        try:
-            font = ImageFont.truetype("Arial.ttf", font_size)
-        except IOError:
+        for font_name in ("Arial.ttf", "arial.ttf", "DejaVuSans.ttf"): # Case variation, then common on Linux
             try:
-                font = ImageFont.truetype("arial.ttf", font_size) # Case variation
+                return ImageFont.truetype(font_name, font_size)
             except IOError:
-                 try:
-                     font = ImageFont.truetype("DejaVuSans.ttf", font_size) # Common on Linux
-                 except IOError:
-                    font = ImageFont.load_default()
-                    logging.warning("Common fonts (Arial, DejaVuSans) not found, using PIL default font. Labels might look basic.")
-
+                continue
+        logging.warning("Common fonts (Arial, DejaVuSans) not found, using PIL default font. Labels might look basic.")
     except Exception as e: # Catch any other font loading errors
-        font = ImageFont.load_default()
         logging.warning(f"Error loading font: {e}. Using PIL default font.")
+    return ImageFont.load_default()
 
+def is_coordinate(value: Any) -> bool:
+    """Checks that a box_2d entry is a finite number (bools, strings, None and NaN are rejected)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
 
-    structured_info_dict = structured_info.model_dump()
-    colors = ["red", "green", "blue", "yellow", "purple", "orange", "cyan", "magenta"]
-    color_index = 0
+def draw_predictions_on_image(image: Image.Image, structured_info: Optional[StructuredImageProperty], font_size: int = 15) -> Image.Image:
+    """
+    Draws bounding boxes and labels from StructuredImageProperty onto a copy of the image.
+    The input image is never modified; it is returned as-is when there is nothing to draw.
+    """
+    if not structured_info:
+        return image
+
+    font = get_font(font_size)
 
-    for field_name, field_value in structured_info_dict.items():
+    # First pass: collect the fields that have a usable box
+    field_names, texts, raw_boxes = [], [], []
+    for field_name in StructuredImageProperty.model_fields:
         #if field_name!='handwritten_notes':
+            field_value = getattr(structured_info, field_name, None)
 
             if isinstance(field_value, dict) and 'text' in field_value and 'box_2d' in field_value:
-                text_label_data = field_value
-                text = text_label_data.get('text', '')
-                box_2d = text_label_data.get('box_2d')
-
-                # 7. Validate Bounding Box: Check if box_2d exists, is a list, and has exactly 4 coordinates.
-                if box_2d and isinstance(box_2d, list) and len(box_2d) == 4:
-                    img_width, img_height = image.size
-                    ## Normal Method
-                    # abs_x1, abs_y1, abs_x2, abs_y2 = map(int, box_2d)
-
-                    ## Gemini Bounding Box processing method
-                    scale = 1000 
-                    abs_y1 = int(box_2d[1] / scale * img_height)
-                    abs_x1 = int(box_2d[0] / scale * img_width)
-                    abs_y2 = int(box_2d[3] / scale * img_height)
-                    abs_x2 = int(box_2d[2] / scale * img_width)
-
-                    # Ensure coordinates are ordered correctly (x1 <= x2, y1 <= y2)
-                    if abs_x1 > abs_x2:
-                        abs_x1, abs_x2 = abs_x2, abs_x1
-                    if abs_y1 > abs_y2:
-                        abs_y1, abs_y2 = abs_y2, abs_y1
-
-                    # Optional: Clamp coordinates to image boundaries after scaling and swapping (Safety measure)
-                    abs_x1 = max(0, min(abs_x1, img_width))
-                    abs_y1 = max(0, min(abs_y1, img_height))
-                    abs_x2 = max(0, min(abs_x2, img_width))
-                    abs_y2 = max(0, min(abs_y2, img_height))
-
-                    # Skip if box is invalid after processing (e.g., zero width/height)
-                    if abs_x1 >= abs_x2 or abs_y1 >= abs_y2:
-                        logging.warning(f"Skipping invalid bbox for {field_name}: {[abs_x1, abs_y1, abs_x2, abs_y2]}")
-                        continue
-
-                    # Select Color
-                    color = colors[color_index % len(colors)]
-                    color_index += 1
-
-                    # Draw Bounding Box
-                    # Note: Using ((x1, y1), (x2, y2)) format for draw.rectangle
-                    draw.rectangle(((abs_x1, abs_y1), (abs_x2, abs_y2)), outline=color, width=3) # Width=3 matches original
-
-                    # Prepare Label Text: Create the label string (e.g., "field_name: detected_text"). Truncate long text.
-                    label = f"{field_name}: {text[:15]}{'...' if len(text)>15 else ''}" # Show field name and truncated text
-                    # Calculate text dimensions using getbbox
-                    try:
-                        # getbbox returns (left, top, right, bottom) relative to origin
-                        text_bbox = font.getbbox(label)
-                        text_width = text_bbox[2] - text_bbox[0]
-                        text_height = text_bbox[3] - text_bbox[1]
-                        # Adjust for potential negative top offset in some fonts
-                        text_y_offset = text_bbox[1] # Accounts for font rendering specifics
-                    except AttributeError: # Fallback if font object doesn't have getbbox
-                        text_width, text_height, text_y_offset = (0, 0, 0)
-                        logging.warning("Font object missing getbbox, cannot determine text size accurately.")
-                    except Exception as e: # Catch other potential errors
-                        text_width, text_height, text_y_offset = (0, 0, 0)
-                        logging.warning(f"Error getting text bbox: {e}")
-
-
-                    # 13. Draw Text Background:
-                    #     - Calculate the position for a filled rectangle (using the chosen color) to act as a background for the text.
-                    #     - Position it slightly above the bounding box (using abs_y1).
-                    # Adjust y position based on text_height and potential negative offset
-                    text_bg_y = max(0, abs_y1 - text_height - text_y_offset - 2) # Position above box, ensure non-negative
-                    # Ensure the background rectangle width calculation uses the calculated text_width
-                    draw.rectangle([abs_x1, text_bg_y, abs_x1 + text_width + 4, text_bg_y + text_height + 2], fill=color)
-
-                    # 14. Draw Text: Draw the label text (in black) on top of the background rectangle.
-                    # Adjust text drawing position based on offset
-                    draw.text((abs_x1 + 2, text_bg_y - text_y_offset + 1), label, fill="black", font=font)
+                box_2d = field_value.get('box_2d')
+
+                # 7. Validate Bounding Box: Check if box_2d exists, is a list, and has exactly 4 finite numeric coordinates.
+                if box_2d and isinstance(box_2d, list) and len(box_2d) == 4 and all(map(is_coordinate, box_2d)):
+                    field_names.append(field_name)
+                    texts.append(field_value.get('text', ''))
+                    raw_boxes.append(box_2d)
                 else:
                     # Log if a field is skipped due to bad box data.
                     logging.warning(f"Skipping field '{field_name}' due to missing or invalid box_2d: {box_2d}")
 
-    return image
+    if not raw_boxes:
+        return image
+
+    # Scale, order and clamp all boxes at once
+    img_width, img_height = image.size
+    ## Normal Method
+    # boxes = np.asarray(raw_boxes, dtype=int)
+
+    ## Gemini Bounding Box processing method
+    scale = 1000
+    limits = np.array([img_width, img_height, img_width, img_height])
+    boxes = (np.asarray(raw_boxes, dtype=float) / scale * limits).astype(int)
+    # Ensure coordinates are ordered correctly (x1 <= x2, y1 <= y2)
+    boxes = np.concatenate([np.minimum(boxes[:, :2], boxes[:, 2:]), np.maximum(boxes[:, :2], boxes[:, 2:])], axis=1)
+    # Optional: Clamp coordinates to image boundaries after scaling and swapping (Safety measure)
+    boxes = boxes.clip(0, limits)
+
+    # Second pass: lay out the labels
+    color_cycle = itertools.cycle(BOX_COLORS)
+    # Boxes and labels are collected first and drawn afterwards in batched passes
+    items = []
+    for field_name, text, (abs_x1, abs_y1, abs_x2, abs_y2) in zip(field_names, texts, boxes.tolist()):
+        # Skip if box is invalid after processing (e.g., zero width/height)
+        if abs_x1 >= abs_x2 or abs_y1 >= abs_y2:
+            logging.warning(f"Skipping invalid bbox for {field_name}: {[abs_x1, abs_y1, abs_x2, abs_y2]}")
+            continue
+
+        # Select Color
+        color = next(color_cycle)
+
+        # Prepare Label Text: Create the label string (e.g., "field_name: detected_text"). Truncate long text.
+        label = f"{field_name}: {text[:15]}{'...' if len(text)>15 else ''}" # Show field name and truncated text
+        # Calculate text dimensions using getbbox
+        try:
+            # getbbox returns (left, top, right, bottom) relative to origin
+            text_bbox = font.getbbox(label)
+            text_width = text_bbox[2] - text_bbox[0]
+            text_height = text_bbox[3] - text_bbox[1]
+            # Adjust for potential negative top offset in some fonts
+            text_y_offset = text_bbox[1] # Accounts for font rendering specifics
+        except AttributeError: # Fallback if font object doesn't have getbbox
+            text_width, text_height, text_y_offset = (0, 0, 0)
+            logging.warning("Font object missing getbbox, cannot determine text size accurately.")
+        except Exception as e: # Catch other potential errors
+            text_width, text_height, text_y_offset = (0, 0, 0)
+            logging.warning(f"Error getting text bbox: {e}")
+
+
+        # 13. Text Background:
+        #     - Calculate the position for a filled rectangle (using the chosen color) to act as a background for the text.
+        #     - Position it slightly above the bounding box (using abs_y1).
+        # Adjust y position based on text_height and potential negative offset
+        text_bg_y = max(0, abs_y1 - text_height - text_y_offset - 2) # Position above box, ensure non-negative
+        # Ensure the background rectangle width calculation uses the calculated text_width
+        text_bg = [abs_x1, text_bg_y, abs_x1 + text_width + 4, text_bg_y + text_height + 2]
+        # 14. Text: Adjust text drawing position based on offset
+        text_xy = (abs_x1 + 2, text_bg_y - text_y_offset + 1)
+
+        # Note: Using ((x1, y1), (x2, y2)) format for draw.rectangle
+        items.append((((abs_x1, abs_y1), (abs_x2, abs_y2)), color, label, text_bg, text_xy))
+
+    if not items:
+        return image
+
+    annotated = image.copy()
+    draw = ImageDraw.Draw(annotated)
+    # Draw all bounding boxes, then all text backgrounds, then all labels (in black) on top
+    for box, color, _, _, _ in items:
+        draw.rectangle(box, outline=color, width=3) # Width=3 matches original
+    for _, color, _, text_bg, _ in items:
+        draw.rectangle(text_bg, fill=color)
+    for _, _, label, _, text_xy in items:
+        draw.text(text_xy, label, fill="black", font=font)
+
+    return annotated
+
+# --- Sample-wise View ---
+
+@st.fragment
+def show_sample(df: pd.DataFrame, json_column: str, image_source_column: str, validation_threshold: int):
+    """
+    Renders row navigation and the Sample-wise view for the selected row.
+    Runs as a fragment, so navigating between rows only reruns this function.
+    """
+    # --- Sample Selection ---
+    if 'selected_index' not in st.session_state:
+        st.session_state.selected_index = 0
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Previous"):
+            st.session_state.selected_index = max(0, st.session_state.selected_index - 1)
+    with col2:
+        if st.button("Next"):
+            st.session_state.selected_index = min(len(df) - 1, st.session_state.selected_index + 1)
+
+    # Add a way to select which row to view
+    # (fragments cannot write to the sidebar, so this lives next to the buttons)
+    st.session_state.selected_index = st.selectbox("Choose a row index:", df.index, index=st.session_state.selected_index)
+
+    selected_index = st.session_state.selected_index
+    st.header(f"Displaying Row: {selected_index}")
+    selected_row = df.iloc[selected_index]
+
+    # --- Parse ImageMaster JSON ---
+    image_master = None
+    json_string = ""
+    try:
+        json_string = selected_row[json_column]
+        if pd.isna(json_string):
+            st.error(f"JSON data in column '{json_column}' for row {selected_index} is empty or NaN.")
+            st.stop()
+        image_master = ImageMaster.model_validate_json(json_string)
+
+        # --- Validate Structured Info ---
+        if image_master.structured_info and image_master.reference_info:
+            validation_results = validate_structured_info(
+                image_master.structured_info,
+                image_master.reference_info,
+                validation_threshold,
+            )
+            field_results = validation_results["field_results"]
+
+            # Create a Pandas DataFrame for the validation results
+            validation_data = []
+            for field, result in field_results.items():
+                validation_data.append((
+                    field,
+                    result.get("status", "unknown"),
+                    result.get("score", 0),
+                    result.get("extracted_value", ""),
+                    result.get("reference_value", ""),
+                ))
+            validation_df = pd.DataFrame.from_records(validation_data, columns=VALIDATION_COLUMNS)
+
+            st.subheader("Validation Results")
+            st.dataframe(validation_df)
+
+        st.subheader("Extracted Information")
+        st.json(
+            image_master.structured_info.model_dump_json(
+                indent=2
+            )
+            if image_master.structured_info
+            else {},
+            expanded=False,
+        )
+    except Exception as e:
+        st.error(f"Error parsing ImageMaster JSON in row {selected_index}: {e}")
+        st.write("JSON Content (first 500 chars):")
+        st.text(str(json_string)[:500])  # Show the problematic JSON (truncated)
+        st.stop()
+
+    # --- Get Image URL/Path ---
+    img_src = None
+    # Priority 1: From ImageMaster JSON
+    if image_master and image_master.image_url:
+        img_src = image_master.image_url
+    # Priority 2: From the specified image source column
+    elif image_source_column and image_source_column in df.columns and pd.notna(selected_row[image_source_column]):
+        img_src = selected_row[image_source_column]
+    else:
+        st.error(f"Could not find image source. Checked ImageMaster JSON ('image_url') and column '{image_source_column}' for row {selected_index}.")
+        st.stop()
+
+
+    # --- Load and Display Image ---
+    if img_src:
+        st.subheader("Image with Predictions")
+        image = None
+        try:
+            # Handle potential local file paths vs URLs
+            if str(img_src).startswith(('http://', 'https://')):
+                image_bytes, content_type = fetch_image_bytes(img_src)
+                # Check content type if possible
+                if content_type and not content_type.startswith('image/'):
+                    st.error(f"URL {img_src} returned content type '{content_type}', not an image.")
+                    st.stop()
+                image = decode_image(image_bytes)
+            else:
+                # Assuming it's a local path
+                image = Image.open(img_src)
+                image.thumbnail(MAX_IMAGE_SIZE, Image.Resampling.LANCZOS)
+
+            if image:
+                # Draw predictions
+                annotated_image = draw_predictions_on_image(image, image_master.structured_info)
+
+                # Display side-by-side
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.image(image, caption=f"Original Image ({img_src})", use_container_width=True)
+                with col2:
+                    st.image(annotated_image, caption="Image with Drawn Predictions", use_container_width=True)
+            else:
+                st.error("Failed to load image object.")
+
+
+        except requests.exceptions.RequestException as e:
+            st.error(f"Error fetching image from URL {img_src}: {e}")
+        except FileNotFoundError:
+            st.error(f"Error: Local image file not found at path: {img_src}")
+        except Exception as e:
+            st.error(f"An unexpected error occurred loading or processing image {img_src}: {e}")
+    else:
+        # This case should be caught earlier, but added for safety
+        st.warning("No image source available to display.")
 
 # --- Streamlit App ---
 
@@ -143,7 +466,7 @@ image_source_column = st.sidebar.text_input("Column with Image URL/Path (if not
 
 if uploaded_file is not None:
     try:
-        df = pd.read_csv(uploaded_file)
+        df = load_csv(uploaded_file.getvalue(), uploaded_file.name, json_column, (image_source_column,))
         st.sidebar.success(f"Loaded {len(df)} rows from {uploaded_file.name}")
 
         if json_column not in df.columns:
@@ -153,23 +476,6 @@ if uploaded_file is not None:
              st.warning(f"Image source column '{image_source_column}' not found. Will rely on 'image_url' within the JSON.")
              # Don't stop, just warn.
 
-        # --- Sample Selection ---
-        if 'selected_index' not in st.session_state:
-            st.session_state.selected_index = 0
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            if st.button("Previous"):
-                st.session_state.selected_index = max(0, st.session_state.selected_index - 1)
-        with col2:
-            if st.button("Next"):
-                st.session_state.selected_index = min(len(df) - 1, st.session_state.selected_index + 1)
-
-        # Add a way to select which row to view
-        st.sidebar.header("Select Image")
-        st.session_state.selected_index = st.sidebar.selectbox("Choose a row index:", df.index, index=st.session_state.selected_index)
-
-
         # --- Validation Threshold Configuration ---
         st.sidebar.header("Benchmarking Mode")
         benchmarking_mode = st.sidebar.radio(
@@ -183,174 +489,15 @@ if uploaded_file is not None:
             "Fuzzy Match Threshold (%)", 0, 100, 50, 5
         )
 
-        st.header(f"Displaying Row: {st.session_state.selected_index}")
-        selected_row = df.iloc[st.session_state.selected_index]
-
         if benchmarking_mode == "Overall":
             # --- Overall Statistics Calculation ---
-            overall_data = []
-            for column in ["text_quality_score", "courier_partner", "awb_number", "recipient_name", "recipient_address", "recipient_signature", "recipient_stamp", "delivery_date"]:
-                total_count = len(df)
-                total_null = 0
-                hallucination_count = 0
-                total_match = 0
-
-                # Calculate match and hallucination count
-                for index, row in df.iterrows():
-                    try:
-                        json_string = row[json_column]
-                        if pd.isna(json_string):
-                            continue  # Skip if JSON is empty
-
-                        image_master = ImageMaster.model_validate_json(json_string)
-
-                        if image_master.structured_info and image_master.reference_info:
-                            validation_results = validate_structured_info(
-                                image_master.structured_info,
-                                image_master.reference_info,
-                                validation_threshold,
-                            )
-                            if column in validation_results["field_results"]:
-                                field_result = validation_results["field_results"][column]
-                                if field_result["status"] == "match":
-                                    total_match += 1
-                                elif field_result["status"] == "hallucination":
-                                    hallucination_count += 1
-                                else:
-                                    total_null +=1
-                            else:
-                                total_null +=1
-                    except Exception as e:
-                        logging.error(f"Error processing row {index}: {e}")
-                        continue
-
-                match_percentage = (total_match / total_count) * 100 if total_count else 0
-                null_percentage = (total_null / total_count) * 100 if total_count else 0
-                hallucination_percentage = (hallucination_count / total_count) * 100 if total_count else 0
-
-                overall_data.append({
-                    "Field": column,
-                    "Total Count": total_count,
-                    "Total Match": total_match,
-                    "Total Null": total_null,
-                    "Hallucination Count": hallucination_count,
-                    "Match Percentage": f"{match_percentage:.2f}%",
-                    "Null Percentage": f"{null_percentage:.2f}%",
-                    "Hallucination Percentage": f"{hallucination_percentage:.2f}%",
-                })
-
-            overall_df = pd.DataFrame(overall_data)
+            overall_df = compute_overall(df[json_column], hash_series(df[json_column]), validation_threshold)
 
             st.subheader("Overall Statistics")
             st.dataframe(overall_df)
 
         else:  # Sample-wise
-            # --- Parse ImageMaster JSON ---
-            image_master = None
-            json_string = ""
-            try:
-                json_string = selected_row[json_column]
-                if pd.isna(json_string):
-                    st.error(f"JSON data in column '{json_column}' for row {st.session_state.selected_index} is empty or NaN.")
-                    st.stop()
-                image_master = ImageMaster.model_validate_json(json_string)
-
-                # --- Validate Structured Info ---
-                if image_master.structured_info and image_master.reference_info:
-                    validation_results = validate_structured_info(
-                        image_master.structured_info,
-                        image_master.reference_info,
-                        validation_threshold,
-                    )
-                    field_results = validation_results["field_results"]
-
-                    # Create a Pandas DataFrame for the validation results
-                    validation_data = []
-                    for field, result in field_results.items():
-                        validation_data.append({
-                            "Field": field,
-                            "Status": result.get("status", "unknown"),
-                            "Score": result.get("score", 0),
-                            "Extracted Value": result.get("extracted_value", ""),
-                            "Reference Value": result.get("reference_value", ""),
-                        })
-                    validation_df = pd.DataFrame(validation_data)
-
-                    st.subheader("Validation Results")
-                    st.dataframe(validation_df)
-
-                st.subheader("Extracted Information")
-                st.json(
-                    image_master.structured_info.model_dump_json(
-                        indent=2
-                    )
-                    if image_master.structured_info
-                    else {},
-                    expanded=False,
-                )
-            except Exception as e:
-                st.error(f"Error parsing ImageMaster JSON in row {selected_index}: {e}")
-                st.write("JSON Content (first 500 chars):")
-                st.text(str(json_string)[:500])  # Show the problematic JSON (truncated)
-                st.stop()
-
-            # --- Get Image URL/Path ---
-            img_src = None
-            # Priority 1: From ImageMaster JSON
-            if image_master and image_master.image_url:
-                img_src = image_master.image_url
-            # Priority 2: From the specified image source column
-            elif image_source_column and image_source_column in df.columns and pd.notna(selected_row[image_source_column]):
-                img_src = selected_row[image_source_column]
-            else:
-                st.error(f"Could not find image source. Checked ImageMaster JSON ('image_url') and column '{image_source_column}' for row {selected_index}.")
-                st.stop()
-
-
-            # --- Load and Display Image ---
-            if img_src:
-                st.subheader("Image with Predictions")
-                image = None
-                try:
-                    # Handle potential local file paths vs URLs
-                    if str(img_src).startswith(('http://', 'https://')):
-                        headers = {'User-Agent': 'Mozilla/5.0'} # Add a user-agent header
-                        response = requests.get(img_src, stream=True, headers=headers, timeout=10) # Add timeout
-                        response.raise_for_status() # Raise an exception for bad status codes
-                        # Check content type if possible
-                        content_type = response.headers.get('content-type')
-                        if content_type and not content_type.startswith('image/'):
-                            st.error(f"URL {img_src} returned content type '{content_type}', not an image.")
-                            st.stop()
-                        image = Image.open(BytesIO(response.content))
-                    else:
-                        # Assuming it's a local path
-                        image = Image.open(img_src)
-
-                    if image:
-                        # Draw predictions
-                        annotated_image = draw_predictions_on_image(image.copy(), image_master.structured_info)
-
-                        # Display side-by-side
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.image(image, caption=f"Original Image ({img_src})", use_container_width=True)
-                        with col2:
-                            st.image(annotated_image, caption="Image with Drawn Predictions", use_container_width=True)
-                    else:
-                        st.error("Failed to load image object.")
-
-
-                except requests.exceptions.RequestException as e:
-                    st.error(f"Error fetching image from URL {img_src}: {e}")
-                except FileNotFoundError:
-                    st.error(f"Error: Local image file not found at path: {img_src}")
-                except Exception as e:
-                    st.error(f"An unexpected error occurred loading or processing image {img_src}: {e}")
-            else:
-                # This case should be caught earlier, but added for safety
-                st.warning("No image source available to display.")
-
+            show_sample(df, json_column, image_source_column, validation_threshold)
 
     except pd.errors.EmptyDataError:
         st.error("The uploaded CSV file is empty.")
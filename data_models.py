@@ -1,4 +1,7 @@
+from dataclasses import dataclass
 from typing import Optional, Dict, Any
+import json
+import orjson
 from pydantic import BaseModel
 
 class TextLabel(BaseModel):
@@ -17,6 +20,24 @@ class StructuredImageProperty(BaseModel):
     delivery_date: Optional[Dict[str, Any]] = None
     handwritten_notes: Optional[Dict[str, Any]] = None
 
+# StructuredImageProperty fields typed as Optional[Dict]; the fast parse path checks their shape
+_DICT_FIELDS = tuple(
+    name for name, field in StructuredImageProperty.model_fields.items()
+    if field.annotation == Optional[Dict[str, Any]]
+)
+
+def _check_dict_or_none(value: Any, name: str) -> None:
+    if value is not None and not isinstance(value, dict):
+        raise ValueError(f"{name} must be an object or null, got {type(value).__name__}")
+
+@dataclass(slots=True)
+class FastImageMaster:
+    # Lightweight, unvalidated counterpart of ImageMaster for bulk parsing (Overall mode).
+    # structured_info is kept as the raw dict, so no nested models are built per row.
+    image_url: Optional[str] = None
+    structured_info: Optional[Dict[str, Any]] = None
+    reference_info: Optional[Dict[str, Any]] = None
+
 class ImageMaster(BaseModel):
     image_url: Optional[str] = None
     image: Optional[Any] = None
@@ -25,9 +46,40 @@ class ImageMaster(BaseModel):
 
     @classmethod
     def model_validate_json(cls, json_string: str):
-        import json
         data = json.loads(json_string)
         # Parse structured_info as StructuredImageProperty if present
         if "structured_info" in data and isinstance(data["structured_info"], dict):
             data["structured_info"] = StructuredImageProperty(**data["structured_info"])
-        return cls(**data)
\ No newline at end of file
+        return cls(**data)
+
+    @classmethod
+    def model_validate_json_fast(cls, json_string: str) -> FastImageMaster:
+        """
+        Parses ImageMaster JSON into a FastImageMaster without building any Pydantic models.
+        Meant for bulk paths (Overall mode); use model_validate_json where full validation matters.
+        Raises ValueError on the same shape errors model_validate_json would reject, so both
+        paths accept the same rows.
+        """
+        try:
+            data = orjson.loads(json_string)
+        except orjson.JSONDecodeError:
+            # orjson rejects input the stdlib accepts (NaN/Infinity literals, lone surrogates),
+            # so fall back to keep accepting the same rows as model_validate_json
+            data = json.loads(json_string)
+        if not isinstance(data, dict):
+            raise ValueError(f"ImageMaster JSON must be an object, got {type(data).__name__}")
+        image_url = data.get("image_url")
+        if image_url is not None and not isinstance(image_url, str):
+            raise ValueError(f"image_url must be a string or null, got {type(image_url).__name__}")
+        structured_info = data.get("structured_info")
+        _check_dict_or_none(structured_info, "structured_info")
+        if structured_info:
+            for name in _DICT_FIELDS:
+                _check_dict_or_none(structured_info.get(name), f"structured_info.{name}")
+        reference_info = data.get("reference_info")
+        _check_dict_or_none(reference_info, "reference_info")
+        return FastImageMaster(
+            image_url=image_url,
+            structured_info=structured_info,
+            reference_info=reference_info,
+        )
@@ -1,4 +1,47 @@
-import difflib
+from rapidfuzz import fuzz
+from data_models import ImageMaster
+
+FIELDS = [
+    "text_quality_score", "courier_partner", "awb_number", "recipient_name",
+    "recipient_address", "recipient_signature", "recipient_stamp", "delivery_date", "handwritten_notes"
+]
+
+def normalize_value(value):
+    """Normalizes a value for comparison (None stays None)."""
+    return None if value is None else str(value).strip().lower()
+
+def _score_normalized(extracted_norm, reference_norm, threshold, cutoff=False):
+    """
+    Scores two pre-normalized values, returning (status, score).
+    With cutoff=True, rapidfuzz may skip the full comparison (e.g. on very different lengths)
+    and report a score of 0 for anything below the threshold; the status is unaffected.
+    """
+    if extracted_norm is None or reference_norm is None:
+        return "null", 0
+    if extracted_norm == reference_norm:
+        return "match", 100
+    # Compute similarity score (0 to 100)
+    score = int(fuzz.ratio(extracted_norm, reference_norm, score_cutoff=threshold if cutoff else None))
+    if score >= threshold:
+        return "match", score
+    return "hallucination", score
+
+def _extracted_value(extracted):
+    """Extracts text if it's a dict with 'text'."""
+    return extracted.get("text") if isinstance(extracted, dict) and "text" in extracted else extracted
+
+def _score_field(extracted, ref, threshold):
+    """Scores one extracted field against its reference value."""
+    extracted_value = _extracted_value(extracted)
+    reference_value = ref
+    status, score = _score_normalized(normalize_value(extracted_value), normalize_value(reference_value), threshold)
+
+    return {
+        "status": status,
+        "score": score,
+        "extracted_value": extracted_value,
+        "reference_value": reference_value,
+    }
 
 def validate_structured_info(structured_info, reference_info, threshold):
     """
@@ -7,34 +50,52 @@ def validate_structured_info(structured_info, reference_info, threshold):
     Uses the threshold to determine match/hallucination/null status.
     """
     field_results = {}
-    fields = [
-        "text_quality_score", "courier_partner", "awb_number", "recipient_name",
-        "recipient_address", "recipient_signature", "recipient_stamp", "delivery_date", "handwritten_notes"
-    ]
-    for field in fields:
+    for field in FIELDS:
         extracted = getattr(structured_info, field, None)
         ref = reference_info.get(field) if reference_info else None
+        field_results[field] = _score_field(extracted, ref, threshold)
+    return {"field_results": field_results}
+
+def normalize_structured_info_dict(structured_info, reference_info):
+    """
+    Pre-normalizes every field of a raw structured_info dict and its reference,
+    returning {field: (extracted_norm, reference_norm)}. The result does not depend
+    on the threshold, so it can be computed once per row and reused.
+    """
+    normalized = {}
+    for field in FIELDS:
+        extracted = structured_info.get(field) if structured_info else None
+        ref = reference_info.get(field) if reference_info else None
+        normalized[field] = (normalize_value(_extracted_value(extracted)), normalize_value(ref))
+    return normalized
 
-        # Extract text if it's a dict with 'text'
-        extracted_value = extracted.get("text") if isinstance(extracted, dict) and "text" in extracted else extracted
-        reference_value = ref
-
-        if extracted_value is None or reference_value is None:
-            status = "null"
-            score = 0
-        else:
-            # Compute similarity ratio (0 to 1)
-            ratio = difflib.SequenceMatcher(None, str(extracted_value).strip().lower(), str(reference_value).strip().lower()).ratio()
-            score = int(ratio * 100)
-            if score >= threshold:
-                status = "match"
-            else:
-                status = "hallucination"
-
-        field_results[field] = {
-            "status": status,
-            "score": score,
-            "extracted_value": extracted_value,
-            "reference_value": reference_value,
-        }
+def validate_structured_info_prenormalized(normalized, threshold):
+    """
+    Validates the output of normalize_structured_info_dict against a threshold.
+    Field results only carry status and score, and scores below the threshold are reported as 0.
+    """
+    field_results = {}
+    for field, (extracted_norm, reference_norm) in normalized.items():
+        status, score = _score_normalized(extracted_norm, reference_norm, threshold, cutoff=True)
+        field_results[field] = {"status": status, "score": score}
     return {"field_results": field_results}
+
+def normalize_image_master_json(json_string):
+    """
+    Parses ImageMaster JSON and pre-normalizes its extracted and reference values.
+    Returns None when the row has no structured or reference info to compare.
+    """
+    image_master = ImageMaster.model_validate_json_fast(json_string)
+    if image_master.structured_info is None or not image_master.reference_info:
+        return None
+    return normalize_structured_info_dict(image_master.structured_info, image_master.reference_info)
+
+def try_normalize_image_master_json(json_string):
+    """
+    Same as normalize_image_master_json, but returns (normalized, error) instead of raising,
+    so one bad row doesn't abort a worker pool map.
+    """
+    try:
+        return normalize_image_master_json(json_string), None
+    except Exception as e:
+        return None, str(e)